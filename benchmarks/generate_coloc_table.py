@@ -0,0 +1,193 @@
+import argparse
+import json
+import os
+import numpy as np
+
+####################################################################
+# Deterministic synthetic colocalization results tables
+####################################################################
+
+# Writes a results table with the standard columns, for benchmarking and
+# testing the pipeline on inputs of any size, e.g.
+#
+#	python benchmarks/generate_coloc_table.py --rows 1000000 data/coloc_results/bench_colocalization_results.txt
+#
+# The table is laid out like a real run: a number of GWAS loci, each placed
+# in a randomly chosen LDetect block of the bundled partition (so that
+# assign_locus_numbers finds them), with one to three reference SNPs tested
+# against the genes near the locus, for a primary trait (and, less often,
+# other traits) across all QTL tissues. GWAS trait and QTL file names are
+# taken from the config file's post_hoc_filter section first, then made up,
+# so that the filters, mutations and classification rules of that config
+# all have something to do.
+#
+# The output depends only on the arguments: the same arguments always give
+# byte-for-byte the same file, whatever its size. Rows are generated and
+# written in chunks, so tables of 10^8 rows or more don't need to fit in
+# memory.
+
+# Rows generated and written at a time; part of the output's definition,
+# since every chunk draws from its own random stream
+generation_chunk_rows = 1000000
+
+ld_partition_files = {
+	"hg19": "data/ldetect/fourier_ls-all.hg19.connected.bed",
+	"hg38": "data/ldetect/fourier_ls-all.hg38.connected.bed"
+}
+
+output_columns = ["ref_snp", "qtl_file", "feature", "n_snps", "neg_log_gwas_pval", "neg_log_qtl_pval", "gwas_trait", "score", "ensembl"]
+
+def load_ld_blocks(build):
+
+	chroms, starts, stops = [], [], []
+	with open(ld_partition_files[build]) as f:
+		for line in f:
+			fields = line.split()
+			if len(fields) < 3 or fields[0].startswith(("#", "track", "browser")):
+				continue
+			chrom = fields[0].lower().replace("chr", "")
+			if not chrom.isdigit():
+				continue
+			chroms.append(int(chrom))
+			starts.append(int(fields[1]))
+			stops.append(int(fields[2]))
+
+	return np.array(chroms), np.array(starts), np.array(stops)
+
+def get_study_names(config_file, num_traits, num_tissues):
+
+	# Names from the config, padded out with made-up ones
+	traits, tissues = [], []
+	if config_file is not None:
+		with open(config_file) as f:
+			post_hoc_filter = json.load(f).get("post_hoc_filter", {})
+		traits = post_hoc_filter.get("kept_gwas", post_hoc_filter.get("removed_gwas", []))
+		tissues = post_hoc_filter.get("kept_qtl", post_hoc_filter.get("removed_qtl", []))
+
+	traits = (list(traits) + [f"Synthetic_Trait_{i}.txt.gz" for i in range(num_traits)])[:num_traits]
+	tissues = (list(tissues) + [f"data/eqtls/synthetic/Tissue_{i}.allpairs.txt.gz.eQTLs.txt.gz" for i in range(num_tissues)])[:num_tissues]
+
+	return traits, tissues
+
+def get_gene_ids(num_genes):
+	return [f"ENSG{i:011d}" for i in range(1, num_genes + 1)]
+
+class SyntheticStudy:
+
+	# Everything shared by all chunks of the table: the loci, their reference
+	# SNPs and nearby genes, and the trait / tissue names
+
+	def __init__(self, num_rows, num_traits, num_tissues, num_genes, num_loci, build, config_file, seed):
+
+		rng = np.random.default_rng([seed, 0])
+
+		self.seed = seed
+		self.num_rows = num_rows
+		self.traits, self.tissues = get_study_names(config_file, num_traits, num_tissues)
+		self.is_sqtl = np.array(["sqtl" in tissue.lower() for tissue in self.tissues])
+		self.genes = np.array(get_gene_ids(num_genes))
+
+		if num_loci is None:
+			num_loci = max(1, min(num_rows // 500, 50000))
+
+		# Loci in distinct LD blocks while there are enough blocks, in genome order
+		chroms, starts, stops = load_ld_blocks(build)
+		blocks = np.sort(rng.choice(len(chroms), num_loci, replace=num_loci > len(chroms)))
+		self.num_loci = num_loci
+
+		# Genes are laid out along the genome, so nearby loci share genes
+		self.locus_first_gene = (np.arange(num_loci) * num_genes) // num_loci
+		self.locus_num_genes = 1 + rng.poisson(4, num_loci)
+		self.locus_trait = rng.integers(0, len(self.traits), num_loci)
+
+		# One to three reference SNPs per locus
+		snps_per_locus = rng.integers(1, 4, num_loci)
+		self.snp_locus = np.repeat(np.arange(num_loci), snps_per_locus)
+		snp_blocks = blocks[self.snp_locus]
+		positions = starts[snp_blocks] + (rng.random(len(snp_blocks)) * (stops[snp_blocks] - starts[snp_blocks])).astype(np.int64)
+		self.snp_chrom = chroms[snp_blocks]
+		self.snp_pos = positions
+		self.snp_ids = np.array([f"{c}_{p}" for c, p in zip(self.snp_chrom, positions)])
+
+	def generate_chunk(self, chunk_index, num_rows):
+
+		rng = np.random.default_rng([self.seed, chunk_index + 1])
+
+		snp = rng.integers(0, len(self.snp_ids), num_rows)
+		locus = self.snp_locus[snp]
+		gene = (self.locus_first_gene[locus] + rng.integers(0, 1 << 30, num_rows) % self.locus_num_genes[locus]) % len(self.genes)
+		tissue = rng.integers(0, len(self.tissues), num_rows)
+
+		# Most tests at a locus are for the trait it's a hit for
+		primary = rng.random(num_rows) < 0.7
+		trait = np.where(primary, self.locus_trait[locus], rng.integers(0, len(self.traits), num_rows))
+
+		n_snps = np.floor(rng.lognormal(5, 1.2, num_rows)).astype(np.int64) + 1
+		neg_log_gwas_pval = rng.exponential(3, num_rows) + np.where(primary, 5, 0)
+		neg_log_qtl_pval = rng.exponential(5, num_rows)
+
+		# Mostly low scores, with a tail of colocalizations
+		score = np.where(rng.random(num_rows) < 0.05, rng.uniform(0.3, 1, num_rows), rng.beta(0.3, 6, num_rows))
+
+		ensembl = np.char.add(self.genes[gene], np.char.add(".", (gene % 9 + 1).astype(str)))
+		sqtl = self.is_sqtl[tissue]
+		intron_start = self.snp_pos[snp] + (gene % 1000) * 100
+		intron = [f"chr{c}:{s}:{s + 5000}:clu_{g}" for c, s, g in zip(self.snp_chrom[snp][sqtl], intron_start[sqtl], gene[sqtl])]
+		feature = ensembl.astype(object)
+		feature[sqtl] = intron
+
+		return {
+			"ref_snp": self.snp_ids[snp],
+			"qtl_file": np.array(self.tissues, dtype=object)[tissue],
+			"feature": feature,
+			"n_snps": n_snps.astype(str),
+			"neg_log_gwas_pval": np.char.mod("%.4f", neg_log_gwas_pval),
+			"neg_log_qtl_pval": np.char.mod("%.4f", neg_log_qtl_pval),
+			"gwas_trait": np.array(self.traits, dtype=object)[trait],
+			"score": np.char.mod("%.6f", score),
+			"ensembl": ensembl
+		}
+
+	def write_table(self, output_file):
+
+		tmp_file = f"{output_file}.{os.getpid()}.tmp"
+		with open(tmp_file, "w") as w:
+			w.write("\t".join(output_columns) + "\n")
+			for chunk_index, start in enumerate(range(0, self.num_rows, generation_chunk_rows)):
+				chunk = self.generate_chunk(chunk_index, min(generation_chunk_rows, self.num_rows - start))
+				columns = [chunk[column].tolist() for column in output_columns]
+				w.write("\n".join("\t".join(row) for row in zip(*columns)) + "\n")
+		os.replace(tmp_file, output_file)
+
+	def write_hgnc_map(self, map_file):
+
+		# A map in the layout of data/hgnc/ensembl_to_hgnc.txt (Ensembl ID in
+		# column 1, HGNC name in column 3), with some genes left unnamed
+		with open(map_file, "w") as w:
+			w.write("ensembl_gene_id\tgene_biotype\thgnc_symbol\n")
+			for i, gene in enumerate(self.genes):
+				name = "" if i % 10 == 0 else f"GENE{i}"
+				w.write(f"{gene}\tprotein_coding\t{name}\n")
+
+def main():
+
+	parser = argparse.ArgumentParser(description="Write a deterministic synthetic colocalization results table.")
+	parser.add_argument("output_file")
+	parser.add_argument("--rows", type=float, default=1e5, help="number of rows, e.g. 1e6 (default 1e5)")
+	parser.add_argument("--traits", type=int, default=16, help="number of distinct GWAS traits (default 16)")
+	parser.add_argument("--tissues", type=int, default=12, help="number of distinct QTL files (default 12)")
+	parser.add_argument("--genes", type=int, default=20000, help="number of distinct Ensembl genes (default 20000)")
+	parser.add_argument("--loci", type=int, default=None, help="number of GWAS loci (default one per 500 rows, at most 50000)")
+	parser.add_argument("--build", choices=sorted(ld_partition_files.keys()), default="hg38", help="genome build of the LD blocks (default hg38)")
+	parser.add_argument("--config", default="config/ir.config", help="config file to take trait and QTL file names from (default config/ir.config)")
+	parser.add_argument("--hgnc-map", default=None, help="also write a matching Ensembl to HGNC map to this file")
+	parser.add_argument("--seed", type=int, default=1)
+	args = parser.parse_args()
+
+	study = SyntheticStudy(int(args.rows), args.traits, args.tissues, args.genes, args.loci, args.build, args.config, args.seed)
+	study.write_table(args.output_file)
+	if args.hgnc_map is not None:
+		study.write_hgnc_map(args.hgnc_map)
+
+if __name__ == "__main__":
+	main()
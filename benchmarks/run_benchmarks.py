@@ -0,0 +1,279 @@
+import argparse
+import hashlib
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+
+####################################################################
+# Benchmark every pipeline stage on synthetic inputs
+####################################################################
+
+# Usage (from the top level of the repository):
+#
+#	python benchmarks/run_benchmarks.py [--sizes 1e3 1e5 1e6] [--stages ...] [--update-golden] [--label text]
+#
+# For each size, a synthetic study is generated with generate_coloc_table.py
+# (along with a matching Ensembl to HGNC map) into benchmarks/work/, using
+# config/ir.config for everything but the HGNC map. Each stage is then run
+# exactly as its Snakefile rule runs it, one after the other, and timed, and
+# its report (see tools/common/instrumentation.R) is read for its peak memory
+# use and the times of its steps. The wizard's profiling pass over the input
+# is timed as well.
+#
+# Outputs are checked against the golden references in benchmarks/golden/,
+# which hold a checksum of every table and class summary written, the names
+# of the heatmap files drawn and a checksum of the wizard's profile. Run with
+# --update-golden on a trusted version to (re)write them. Checksums are of the
+# exact file contents, so they assume the package versions in
+# environment.yml.
+#
+# Every run is appended to benchmarks/results/benchmark_results.jsonl, and
+# compared with the last earlier run of the same case.
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+sys.path.insert(0, os.path.join(repo_dir, "benchmarks"))
+
+import input_profile
+import generate_coloc_table
+
+work_dir = "benchmarks/work"
+golden_dir = "benchmarks/golden"
+results_file = "benchmarks/results/benchmark_results.jsonl"
+
+base_config_file = "config/ir.config"
+
+stages = ["post_hoc_filter", "mutate_columns", "add_hgnc_names", "assign_locus_numbers", "classify_results", "make_heatmaps"]
+
+class BenchmarkCase:
+
+	# File layout of one synthetic study, mirroring the Snakefile's
+
+	def __init__(self, rows, seed):
+		self.rows = rows
+		self.seed = seed
+		self.name = f"rows{rows}_seed{seed}"
+		self.dir = f"{work_dir}/{self.name}"
+		self.input_file = f"{self.dir}/bench_colocalization_results.txt"
+		self.hgnc_map_file = f"{self.dir}/ensembl_to_hgnc.txt"
+		self.config_file = f"{self.dir}/bench.config"
+		self.summary_file = f"{self.dir}/classify_results/bench_class_summary_completion_indicator.tmp"
+		self.heatmap_dir = f"{self.dir}/make_heatmaps/bench"
+		self.completion_indicator = f"{self.dir}/make_heatmaps/bench_completion_indicator.tmp"
+
+	def get_output_file(self, stage):
+		return f"{self.dir}/{stage}/bench_colocalization_results.txt"
+
+	def get_input_file(self, stage):
+		if stage == stages[0]:
+			return self.input_file
+		return self.get_output_file(stages[stages.index(stage) - 1])
+
+	def get_stage_command(self, stage):
+		input_file = self.get_input_file(stage)
+		if stage == "classify_results":
+			return ["Rscript", f"tools/{stage}/{stage}.R", self.config_file, input_file, self.get_output_file(stage), self.summary_file]
+		if stage == "make_heatmaps":
+			return ["Rscript", f"tools/{stage}/{stage}.R", self.config_file, input_file, self.heatmap_dir, self.completion_indicator]
+		return ["Rscript", f"tools/{stage}/{stage}.R", self.config_file, input_file, self.get_output_file(stage)]
+
+	def get_report_file(self, stage):
+		if stage == "make_heatmaps":
+			return f"{self.completion_indicator}.report.json"
+		return f"{self.get_output_file(stage)}.report.json"
+
+def prepare_case(case):
+
+	# Generate the input only if it isn't there already for these parameters
+	os.makedirs(case.dir, exist_ok=True)
+	for stage in stages:
+		os.makedirs(f"{case.dir}/{stage}", exist_ok=True)
+
+	parameters_file = f"{case.dir}/parameters.json"
+	parameters = {"rows": case.rows, "seed": case.seed, "generator": file_checksum("benchmarks/generate_coloc_table.py")}
+	if not (os.path.isfile(case.input_file) and os.path.isfile(parameters_file) and load_json(parameters_file) == parameters):
+		print(f"Generating {case.rows} rows into {case.input_file}")
+		study = generate_coloc_table.SyntheticStudy(case.rows, 16, 12, 20000, None, "hg38", base_config_file, case.seed)
+		study.write_table(case.input_file)
+		study.write_hgnc_map(case.hgnc_map_file)
+		with open(parameters_file, "w") as w:
+			json.dump(parameters, w)
+
+	config = load_json(base_config_file)
+	config["add_hgnc_names"]["ensembl_to_hgnc_map_file"] = case.hgnc_map_file
+	with open(case.config_file, "w") as w:
+		json.dump(config, w, indent=4)
+
+def run_stage(case, stage):
+
+	start = time.perf_counter()
+	subprocess.run(case.get_stage_command(stage), cwd=repo_dir, check=True)
+	seconds = time.perf_counter() - start
+
+	result = {"seconds": round(seconds, 3)}
+	if os.path.isfile(case.get_report_file(stage)):
+		report = load_json(case.get_report_file(stage))
+		for key in ["peak_rss_mb", "rows_in", "rows_out", "steps"]:
+			if key in report:
+				result[key] = report[key]
+
+	return result
+
+def run_profiling_pass(case):
+
+	start = time.perf_counter()
+	profile = input_profile.profile_input_file(case.input_file)
+	seconds = time.perf_counter() - start
+
+	return {"seconds": round(seconds, 3)}, profile
+
+def get_outputs(case, profile):
+
+	# What's compared with the golden references
+	outputs = {}
+	for stage in stages:
+		if os.path.isfile(case.get_output_file(stage)):
+			outputs[stage] = file_checksum(case.get_output_file(stage))
+
+	summary_dir = os.path.dirname(case.summary_file)
+	for file in sorted(os.listdir(summary_dir)):
+		if file.startswith("bench_class_summary") and file.endswith(".txt"):
+			outputs[f"classify_results/{file}"] = file_checksum(f"{summary_dir}/{file}")
+
+	if os.path.isdir(case.heatmap_dir):
+		outputs["make_heatmaps"] = sorted(os.path.relpath(os.path.join(path, file), case.heatmap_dir)
+			for path, _, files in os.walk(case.heatmap_dir) for file in files if file != "page_manifest.tsv")
+
+	# The profile minus what depends on where and when the file was written
+	profile = {key: value for key, value in profile.items() if key not in ["file", "fingerprint"]}
+	outputs["wizard_profile"] = hashlib.sha256(json.dumps(profile, sort_keys=True).encode()).hexdigest()
+
+	return outputs
+
+def check_golden(case, outputs, update):
+
+	golden_file = f"{golden_dir}/{case.name}.json"
+	if update:
+		os.makedirs(golden_dir, exist_ok=True)
+		with open(golden_file, "w") as w:
+			json.dump(outputs, w, indent=4, sort_keys=True)
+		return "updated"
+
+	if not os.path.isfile(golden_file):
+		return "no golden reference"
+
+	golden = load_json(golden_file)
+	mismatched = [key for key in outputs if key in golden and golden[key] != outputs[key]]
+	missing = [key for key in golden if key not in outputs]
+	if mismatched or missing:
+		return "MISMATCH: " + ", ".join(mismatched + [f"{key} (missing)" for key in missing])
+	return "match"
+
+def run_case(rows, seed, selected_stages, update_golden, label):
+
+	case = BenchmarkCase(rows, seed)
+	prepare_case(case)
+
+	result = {
+		"case": case.name,
+		"rows": rows,
+		"label": label,
+		"time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+		"commit": get_git_commit(),
+		"host": socket.gethostname(),
+		"platform": platform.platform(),
+		"stages": {}
+	}
+
+	for stage in selected_stages:
+		if not os.path.isfile(os.path.join(repo_dir, case.get_input_file(stage))):
+			raise FileNotFoundError(f"{case.get_input_file(stage)} doesn't exist; run the stages before {stage} first")
+		print(f"[{case.name}] {stage}")
+		result["stages"][stage] = run_stage(case, stage)
+
+	print(f"[{case.name}] wizard profiling pass")
+	result["stages"]["wizard_profile"], profile = run_profiling_pass(case)
+
+	result["golden"] = check_golden(case, get_outputs(case, profile), update_golden)
+
+	return result
+
+def load_previous_results(case_name):
+
+	if not os.path.isfile(results_file):
+		return None
+
+	previous = None
+	with open(results_file) as f:
+		for line in f:
+			if line.strip() == "":
+				continue
+			result = json.loads(line)
+			if result["case"] == case_name:
+				previous = result
+	return previous
+
+def record_result(result):
+
+	os.makedirs(os.path.dirname(results_file), exist_ok=True)
+	with open(results_file, "a") as w:
+		w.write(json.dumps(result) + "\n")
+
+def print_comparison(result, previous):
+
+	print(f"\n{result['case']} (golden: {result['golden']})")
+	if previous is not None:
+		print(f"compared with {previous['time']} (commit {previous['commit']})")
+	print(f"{'stage':<24}{'seconds':>10}{'peak MB':>10}{'previous':>10}{'change':>9}")
+	for stage, timing in result["stages"].items():
+		line = f"{stage:<24}{timing['seconds']:>10.2f}{timing.get('peak_rss_mb', float('nan')):>10.1f}"
+		if previous is not None and stage in previous["stages"]:
+			before = previous["stages"][stage]["seconds"]
+			line += f"{before:>10.2f}{timing['seconds'] / max(before, 1e-3):>8.2f}x"
+		print(line)
+
+def get_git_commit():
+	try:
+		return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=repo_dir, capture_output=True, text=True, check=True).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+def file_checksum(file):
+	checksum = hashlib.sha256()
+	with open(file, "rb") as f:
+		for block in iter(lambda: f.read(16 * 1024 * 1024), b""):
+			checksum.update(block)
+	return checksum.hexdigest()
+
+def load_json(file):
+	with open(file) as f:
+		return json.load(f)
+
+def main():
+
+	parser = argparse.ArgumentParser(description="Time every pipeline stage on synthetic inputs and check the outputs against golden references.")
+	parser.add_argument("--sizes", type=float, nargs="+", default=[1e3, 1e5, 1e6], help="numbers of input rows (default 1e3 1e5 1e6)")
+	parser.add_argument("--stages", nargs="+", choices=stages, default=stages, help="stages to run (default all); earlier stages' outputs must exist")
+	parser.add_argument("--seed", type=int, default=1)
+	parser.add_argument("--update-golden", action="store_true", help="write the outputs as the new golden references")
+	parser.add_argument("--label", default=None, help="note to record with the results, e.g. the change being measured")
+	args = parser.parse_args()
+
+	os.chdir(repo_dir)
+
+	failed = False
+	for rows in args.sizes:
+		result = run_case(int(rows), args.seed, [stage for stage in stages if stage in args.stages], args.update_golden, args.label)
+		previous = load_previous_results(result["case"])
+		record_result(result)
+		print_comparison(result, previous)
+		failed = failed or result["golden"].startswith("MISMATCH")
+
+	sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,271 @@
+import collections
+import hashlib
+import json
+import os
+import zipfile
+import numpy as np
+
+####################################################################
+# Single-pass profiling of a colocalization results file
+####################################################################
+
+# The wizard needs a handful of facts about the input file (row count, score
+# distribution, the distinct values of categorical columns). These are all
+# gathered here in one streaming pass over the file, reading it in large
+# chunks, so that no later question has to go back to disk.
+#
+# The profile is also saved in a sidecar file next to the input
+# ("{coloc_file}.profile.json"), so that resuming the wizard later doesn't
+# need to scan the file again unless it has changed since.
+#
+# The same pass also keeps the columns that post_hoc_filter thresholds apply
+# to, in full, with every test's GWAS trait and QTL file as a number, so the
+# wizard can preview the effect of a threshold without reading the file again
+# (see threshold_preview.py). These are saved next to the profile, in
+# "{coloc_file}.profile.npz".
+
+# Bytes read from the input file at a time
+read_chunk_size = 64 * 1024 * 1024
+
+# Columns with more distinct values than this (e.g. SNP or gene IDs) are
+# considered high-cardinality, and their values are not kept in the profile
+max_distinct_values = 10000
+
+# Columns whose distinct values are always kept, regardless of cardinality
+always_tracked_columns = ["gwas_trait", "qtl_file"]
+
+# Percentiles of the score column stored in the profile
+score_percentiles = list(range(101))
+
+# Bump this whenever the contents of the profile change, so that
+# sidecar files written by older versions are ignored
+profile_format_version = 1
+
+# Columns kept in full for previewing thresholds, and the columns whose
+# values are kept as numbers for each test
+threshold_columns = ["score", "neg_log_gwas_pval", "neg_log_qtl_pval", "n_snps"]
+group_columns = ["gwas_trait", "qtl_file"]
+
+# Bytes from the start and from the end of the input file that are hashed
+# when checking whether a sidecar file is still up to date
+fingerprint_sample_size = 1024 * 1024
+
+def get_file_fingerprint(coloc_file):
+
+	# Identify this version of the input by its size, modification time and a
+	# hash of its first and last megabyte; hashing the whole file would cost
+	# about as much as profiling it again
+	stat = os.stat(coloc_file)
+	content_hash = hashlib.blake2b(digest_size=16)
+	with open(coloc_file, "rb") as f:
+		content_hash.update(f.read(fingerprint_sample_size))
+		if stat.st_size > fingerprint_sample_size:
+			f.seek(max(stat.st_size - fingerprint_sample_size, fingerprint_sample_size))
+			content_hash.update(f.read(fingerprint_sample_size))
+
+	return {
+		"format_version": profile_format_version,
+		"size": stat.st_size,
+		"mtime_ns": stat.st_mtime_ns,
+		"content_hash": content_hash.hexdigest()
+	}
+
+def get_sidecar_file(coloc_file):
+	return f"{coloc_file}.profile.json"
+
+def load_profile_sidecar(coloc_file):
+
+	# Returns the saved profile for this input file, or None if there isn't
+	# one or the input has changed since it was written
+	sidecar_file = get_sidecar_file(coloc_file)
+	if not os.path.isfile(sidecar_file):
+		return None
+
+	try:
+		with open(sidecar_file) as f:
+			profile = json.load(f)
+	except (OSError, ValueError):
+		return None
+
+	if profile.get("fingerprint") != get_file_fingerprint(coloc_file):
+		return None
+
+	return profile
+
+def save_profile_sidecar(coloc_file, profile):
+
+	# Not being able to save the profile (e.g. for a read-only data
+	# directory) only means the next session has to scan the file again
+	sidecar_file = get_sidecar_file(coloc_file)
+	tmp_file = f"{sidecar_file}.{os.getpid()}.tmp"
+	try:
+		with open(tmp_file, "w") as w:
+			json.dump(profile, w)
+		os.replace(tmp_file, sidecar_file)
+	except OSError:
+		pass
+
+def get_arrays_file(coloc_file):
+	return f"{coloc_file}.profile.npz"
+
+def load_threshold_arrays(coloc_file, profile):
+
+	# Returns the saved threshold columns for this version of the input file
+	# (as identified by its profile), or None if they're missing or out of date
+	arrays_file = get_arrays_file(coloc_file)
+	if not os.path.isfile(arrays_file):
+		return None
+
+	try:
+		with np.load(arrays_file) as data:
+			if str(data["fingerprint"]) != json.dumps(profile["fingerprint"], sort_keys=True):
+				return None
+			return {name: data[name] for name in data.files if name != "fingerprint"}
+	except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+		return None
+
+def save_threshold_arrays(coloc_file, profile, arrays):
+
+	# As with the profile, failing to save only costs a rescan next time
+	arrays_file = get_arrays_file(coloc_file)
+	tmp_file = f"{arrays_file}.{os.getpid()}.tmp.npz"
+	try:
+		np.savez(tmp_file, fingerprint=np.array(json.dumps(profile["fingerprint"], sort_keys=True)), **arrays)
+		os.replace(tmp_file, arrays_file)
+	except OSError:
+		pass
+
+def read_line_chunks(coloc_file):
+
+	# Yields (header, lines) for every chunk of complete lines in the file
+	with open(coloc_file, "rb") as f:
+		header = f.readline().decode().rstrip("\r\n").split("\t")
+		remainder = b""
+		while True:
+			chunk = f.read(read_chunk_size)
+			if not chunk:
+				break
+			chunk = remainder + chunk
+			last_newline = chunk.rfind(b"\n")
+			if last_newline == -1:
+				remainder = chunk
+				continue
+			remainder = chunk[last_newline+1:]
+			yield header, chunk[:last_newline].decode().split("\n")
+
+		if remainder.strip():
+			yield header, [remainder.decode()]
+
+def to_float_array(values):
+
+	try:
+		return np.asarray(values, dtype=np.float64)
+	except ValueError:
+		# Fall back to value-by-value parsing, treating anything
+		# non-numeric (e.g. "NA") as missing
+		parsed = np.empty(len(values), dtype=np.float64)
+		for i, v in enumerate(values):
+			try:
+				parsed[i] = float(v)
+			except ValueError:
+				parsed[i] = np.nan
+		return parsed
+
+def profile_input_file(coloc_file):
+	return scan_input_file(coloc_file)[0]
+
+def scan_input_file(coloc_file):
+
+	# Returns the profile of the file and its threshold columns
+
+	# Fingerprint the file before reading it, so that a change made while
+	# it's being scanned will invalidate the saved profile
+	fingerprint = get_file_fingerprint(coloc_file)
+
+	header = None
+	num_rows = 0
+	value_chunks = {column: [] for column in threshold_columns}
+	code_chunks = {column: [] for column in group_columns}
+	group_values = {column: {} for column in group_columns}
+	value_counts = None
+	high_cardinality = set([])
+
+	for header, lines in read_line_chunks(coloc_file):
+
+		if value_counts is None:
+			value_counts = {column: collections.Counter() for column in header}
+
+		rows = [line.rstrip("\r").split("\t") for line in lines if line.strip() != ""]
+		if len(rows) == 0:
+			continue
+
+		for row in rows:
+			if len(row) < len(header):
+				raise ValueError(f"Found a line in {coloc_file} with {len(row)} fields, but the header has {len(header)} columns:\n{row}")
+
+		num_rows += len(rows)
+
+		# Work column-by-column on the whole chunk rather than field-by-field
+		# (any extra trailing fields beyond the header are ignored)
+		columns = list(zip(*rows))
+
+		for column in threshold_columns:
+			if column in header:
+				value_chunks[column].append(to_float_array(columns[header.index(column)]))
+
+		# Number the values of the chunk, then map those to numbers for the whole file
+		for column in group_columns:
+			if column in header:
+				chunk_values, chunk_codes = np.unique(np.asarray(columns[header.index(column)]), return_inverse=True)
+				codes = np.array([group_values[column].setdefault(value, len(group_values[column])) for value in chunk_values.tolist()], dtype=np.int32)
+				code_chunks[column].append(codes[chunk_codes.ravel()])
+
+		for i, column in enumerate(header):
+			if column in high_cardinality:
+				continue
+			value_counts[column].update(columns[i])
+			if len(value_counts[column]) > max_distinct_values and column not in always_tracked_columns:
+				high_cardinality.add(column)
+				del value_counts[column]
+
+	if header is None:
+		with open(coloc_file) as f:
+			header = f.readline().rstrip("\r\n").split("\t")
+		value_counts = {column: collections.Counter() for column in header}
+
+	profile = {
+		"file": coloc_file,
+		"fingerprint": fingerprint,
+		"columns": header,
+		"num_rows": num_rows,
+		"score_quantiles": None,
+		"distinct_values": {column: dict(counts) for column, counts in value_counts.items()},
+		"high_cardinality_columns": [column for column in header if column in high_cardinality]
+	}
+
+	arrays = {}
+	for column in threshold_columns:
+		if column in header:
+			arrays[column] = np.concatenate(value_chunks[column]) if num_rows > 0 else np.empty(0)
+	for column in group_columns:
+		if column in header:
+			arrays[f"{column}_codes"] = np.concatenate(code_chunks[column]) if num_rows > 0 else np.empty(0, dtype=np.int32)
+			arrays[f"{column}_values"] = np.array(list(group_values[column].keys()), dtype=str)
+
+	if "score" in arrays and num_rows > 0:
+		profile["score_quantiles"] = [float(q) for q in np.nanquantile(arrays["score"], [p / 100 for p in score_percentiles])]
+
+	return profile, arrays
+
+def get_score_quantile(profile, quantile):
+
+	# Look up a stored score quantile, e.g. 0.1 for the 10th percentile
+	return profile["score_quantiles"][score_percentiles.index(int(round(quantile * 100)))]
+
+def get_distinct_values(profile, column):
+
+	# Returns the set of values observed in the column, or None if the column
+	# had too many distinct values to keep track of
+	if column not in profile["distinct_values"]:
+		return None
+	return set(profile["distinct_values"][column].keys())
@@ -0,0 +1,143 @@
+import numpy as np
+
+####################################################################
+# Instant previews of post_hoc_filter thresholds
+####################################################################
+
+# While the wizard asks for the colocalization cutoff and the p-value and SNP
+# count thresholds, it shows how many tests each candidate threshold would
+# keep, overall and for every GWAS trait and QTL file, both on its own and
+# together with the filters chosen so far. All of this is answered from the
+# columns kept in memory by input_profile.scan_input_file, never by reading
+# the input file again.
+#
+# Each column is sorted once, on first use, both as a whole and within every
+# trait / QTL file, so the number of tests on either side of a threshold is
+# found by binary search. Counting a combination of filters takes one
+# vectorized pass over the columns in memory.
+#
+# The filters are applied as post_hoc_filter applies them: a test passes a
+# p-value threshold if its p-value is below it (or below the exception for its
+# trait / QTL file, if that's larger), and the SNP count threshold
+# if it has at least that many SNPs. It is colocalized if its score is above
+# the cutoff. Missing values never pass.
+
+# Most traits / QTL files listed in a breakdown; the rest are summarized
+max_breakdown_rows = 30
+
+class ThresholdPreview:
+
+	def __init__(self, arrays):
+		self.arrays = arrays
+		self.num_tests = len(arrays["score"])
+		self.sorted_columns = {}
+
+	def has_column(self, column):
+		return column in self.arrays
+
+	def get_group_values(self, group_column):
+		return self.arrays[f"{group_column}_values"]
+
+	def get_sorted(self, column, group_column=None):
+
+		# The non-missing values of a column in ascending order, or, by group,
+		# ordered by group and then value, along with where each group starts
+		key = (column, group_column)
+		if key not in self.sorted_columns:
+			values = self.arrays[column]
+			present = ~np.isnan(values)
+			if group_column is None:
+				self.sorted_columns[key] = (np.sort(values[present]), None)
+			else:
+				codes = self.arrays[f"{group_column}_codes"][present]
+				order = np.lexsort((values[present], codes))
+				group_starts = np.searchsorted(codes[order], np.arange(len(self.get_group_values(group_column)) + 1))
+				self.sorted_columns[key] = (values[present][order], group_starts)
+
+		return self.sorted_columns[key]
+
+	def count_above(self, column, threshold, group_column=None, inclusive=False):
+
+		# Number of tests with a value above the threshold (or equal to it, if
+		# inclusive), overall or per group
+		side = "left" if inclusive else "right"
+		values, group_starts = self.get_sorted(column, group_column)
+		if group_column is None:
+			return len(values) - int(np.searchsorted(values, threshold, side=side))
+
+		counts = np.empty(len(group_starts) - 1, dtype=np.int64)
+		for group in range(len(counts)):
+			group_values = values[group_starts[group]:group_starts[group+1]]
+			counts[group] = len(group_values) - np.searchsorted(group_values, threshold, side=side)
+		return counts
+
+	def get_passing_mask(self, filters):
+
+		# Which tests pass all of the filters in a post_hoc_filter config
+		passing = np.ones(self.num_tests, dtype=bool)
+
+		for group_column, kept, removed in [("gwas_trait", "kept_gwas", "removed_gwas"), ("qtl_file", "kept_qtl", "removed_qtl")]:
+			if kept in filters or removed in filters:
+				listed = np.isin(self.get_group_values(group_column), filters.get(kept, filters.get(removed)))
+				allowed = listed if kept in filters else ~listed
+				passing &= allowed[self.arrays[f"{group_column}_codes"]]
+
+		# As in post_hoc_filter, a trait or QTL file with an exception can't
+		# have a stricter threshold than the standard one
+		for column, threshold, group_column in [("neg_log_gwas_pval", "gwas_pval_threshold", "gwas_trait"), ("neg_log_qtl_pval", "qtl_pval_threshold", "qtl_file")]:
+			if threshold in filters and self.has_column(column):
+				threshold_set = filters[threshold]
+				group_values = self.get_group_values(group_column)
+				group_thresholds = np.full(len(group_values), float(threshold_set["standard"]))
+				for name, exception in threshold_set.get("exceptions", {}).items():
+					group_thresholds[group_values == name] = max(float(threshold_set["standard"]), float(exception))
+				neg_log_thresholds = np.array([to_neg_log(t) for t in group_thresholds])
+				passing &= self.arrays[column] > neg_log_thresholds[self.arrays[f"{group_column}_codes"]]
+
+		if "snp_count_min_threshold" in filters and self.has_column("n_snps"):
+			passing &= self.arrays["n_snps"] >= filters["snp_count_min_threshold"]
+
+		return passing
+
+	def count_by_group(self, mask, group_column):
+		return np.bincount(self.arrays[f"{group_column}_codes"][mask], minlength=len(self.get_group_values(group_column)))
+
+def to_neg_log(pvalue):
+	return np.inf if pvalue <= 0 else -np.log10(pvalue)
+
+def print_threshold_preview(preview, column, threshold, filters, inclusive=False, description="pass this threshold"):
+
+	# Show how many tests a candidate threshold on a column would keep, on its
+	# own and combined with the filters in "filters" (a post_hoc_filter config,
+	# including the candidate); for the score cutoff, the combined count is of
+	# the colocalized tests among those passing the filters
+	alone = preview.count_above(column, threshold, inclusive=inclusive)
+	passing = preview.get_passing_mask(filters)
+	if column == "score":
+		combined_mask = passing & (preview.arrays["score"] > threshold)
+		combined_label = "colocalized among tests passing the filters so far"
+	else:
+		combined_mask = passing
+		combined_label = "pass all filters so far"
+
+	print(f"\n{alone:,} of {preview.num_tests:,} tests ({percent(alone, preview.num_tests)}) {description}.")
+	print(f"{int(combined_mask.sum()):,} tests ({percent(int(combined_mask.sum()), preview.num_tests)}) {combined_label}.")
+
+	for group_column, title in [("gwas_trait", "GWAS trait"), ("qtl_file", "QTL file")]:
+		if f"{group_column}_codes" not in preview.arrays:
+			continue
+		print_breakdown(title, preview.get_group_values(group_column), preview.count_above(column, threshold, group_column, inclusive), preview.count_by_group(combined_mask, group_column))
+
+def print_breakdown(title, names, alone, combined):
+
+	order = np.argsort(-combined, kind="stable")
+	width = min(60, max([len(title)] + [len(str(name)) for name in names]))
+	print(f"\n\t{title:<{width}}\t{'alone':>12}\t{'combined':>12}")
+	for group in order[:max_breakdown_rows]:
+		print(f"\t{str(names[group])[-width:]:<{width}}\t{alone[group]:>12,}\t{combined[group]:>12,}")
+	if len(order) > max_breakdown_rows:
+		rest = order[max_breakdown_rows:]
+		print(f"\t{f'({len(rest)} more)':<{width}}\t{int(alone[rest].sum()):>12,}\t{int(combined[rest].sum()):>12,}")
+
+def percent(count, total):
+	return f"{100 * count / total:.1f}%" if total > 0 else "0%"
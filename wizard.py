@@ -1,8 +1,9 @@
 import sys
 import os
-import numpy as np
 import pprint
 import json
+import input_profile
+import threshold_preview
 pp = pprint.PrettyPrinter(indent=4)
 
 def save_results(part_config):
@@ -115,12 +116,19 @@ def main():
 			continue
 		else:
 			coloc_file = f"data/coloc_results/{inp}"
-			num_results = 0
 
-			with open(coloc_file) as f:
-				header = f.readline().strip().split("\t")
-				for line in f:
-					num_results += 1
+			# Everything the wizard needs to know about the input is gathered
+			# here in a single pass, and later questions are answered from it.
+			# If a previous session already profiled this file, reuse that.
+			profile = input_profile.load_profile_sidecar(coloc_file)
+			threshold_arrays = None if profile is None else input_profile.load_threshold_arrays(coloc_file, profile)
+			if threshold_arrays is None:
+				print("\nScanning your input file...")
+				profile, threshold_arrays = input_profile.scan_input_file(coloc_file)
+				input_profile.save_profile_sidecar(coloc_file, profile)
+				input_profile.save_threshold_arrays(coloc_file, profile, threshold_arrays)
+			header = profile["columns"]
+			num_results = profile["num_rows"]
 
 			print("\nGreat, we found a file with the following columns:")
 			print(header)
@@ -143,17 +151,12 @@ def main():
 			print(f"The input file needs to have the following columns: {required_columns}. I didn't detect a '{column}' column. Please reformat the file accordingly and then re-enter the wizard.\n\n")
 			sys.exit()
 	
+	# Counts of tests passing candidate thresholds, shown as they're entered
+	preview = threshold_preview.ThresholdPreview(threshold_arrays)
+
 	# Now get the key info from the file
-	scores = []
-	all_gwas_traits = set([])
-	all_qtl_files = set([])
-	with open(coloc_file) as f:
-		f.readline()
-		for line in f:
-			data = line.strip().split()
-			scores.append(float(data[header.index("score")]))
-			all_gwas_traits.add(data[header.index("gwas_trait")])
-			all_qtl_files.add(data[header.index("qtl_file")])
+	all_gwas_traits = input_profile.get_distinct_values(profile, "gwas_trait")
+	all_qtl_files = input_profile.get_distinct_values(profile, "qtl_file")
 
 	if "post_hoc_filter" not in config or "completed_wizard" not in config["post_hoc_filter"] or config["post_hoc_filter"]["completed_wizard"] != "True":
 
@@ -167,7 +170,7 @@ def main():
 
 		print("First, let's determine a cutoff score for colocalization.\n\nFor reference, the quantiles of scores in your input data are the following:\n")
 		quantiles = [0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1]
-		score_quants = np.quantile(scores, quantiles)
+		score_quants = [input_profile.get_score_quantile(profile, q) for q in quantiles]
 		for i in range(len(score_quants)):
 			print(f"{quantiles[i]*100}%:\t{score_quants[i]}")
 
@@ -176,11 +179,13 @@ def main():
 			inp = screen_input("\nPlease enter a cutoff score:\n\n", config)
 			try:
 				threshold = float(inp)
-				done = True
 			except:
 				print("\nWhoops, that doesn't look right. The cutoff score should be a numerical value.\n")
 				continue
 
+			threshold_preview.print_threshold_preview(preview, "score", threshold, config["post_hoc_filter"], description=f"have a score above {threshold}")
+			done = get_yes_no("\nUse this cutoff? (yes/no)\n\n", config)
+
 		config["post_hoc_filter"]["colocalization_threshold"] = threshold
 
 		yesno = get_yes_no(f"\nExcellent.\n\nI found the following GWAS traits in your file:\n\n{all_gwas_traits}\n\nOptionally, you can either exclude specific traits, or choose a specific limited set of traits to include.\n\nWould you like to exclude any specific traits? (yes/no)\n\n", config)
@@ -311,11 +316,16 @@ def main():
 					if gwas_pval_threshold < 0 or gwas_pval_threshold > 1: 
 						print("\nThat doesn't fall within the p-value range of 0 to 1 a numerical value. Try again.\n")
 						continue
-					break
 				except:
 					print("\nThat doesn't look like a numerical value. Try again.\n")
 					continue
 
+				candidate = dict(config["post_hoc_filter"], gwas_pval_threshold={"standard": gwas_pval_threshold})
+				threshold_preview.print_threshold_preview(preview, "neg_log_gwas_pval", threshold_preview.to_neg_log(gwas_pval_threshold), candidate,
+					description=f"have a GWAS p-value below {gwas_pval_threshold}")
+				if get_yes_no("\nUse this threshold? (yes/no)\n\n", config):
+					break
+
 			if not no_threshold:
 				config["post_hoc_filter"]["gwas_pval_threshold"]= {"standard": gwas_pval_threshold}
 
@@ -343,11 +353,16 @@ def main():
 					if qtl_pval_threshold < 0 or qtl_pval_threshold > 1: 
 						print("\nThat doesn't fall within the p-value range of 0 to 1 a numerical value. Try again.\n")
 						continue
-					break
 				except:
 					print("\nThat doesn't look like a numerical value. Try again.\n")
 					continue
 
+				candidate = dict(config["post_hoc_filter"], qtl_pval_threshold={"standard": qtl_pval_threshold})
+				threshold_preview.print_threshold_preview(preview, "neg_log_qtl_pval", threshold_preview.to_neg_log(qtl_pval_threshold), candidate,
+					description=f"have a QTL p-value below {qtl_pval_threshold}")
+				if get_yes_no("\nUse this threshold? (yes/no)\n\n", config):
+					break
+
 			if not no_threshold:
 				config["post_hoc_filter"]["qtl_pval_threshold"]= {"standard": qtl_pval_threshold}
 
@@ -372,11 +387,19 @@ def main():
 					if snps < 1: 
 						print("\nNice try...you need a positive integer number of SNPs.\n")
 						continue
-					break
 				except:
 					print("\nNice try...you need a positive integer number of SNPs.\n")
 					continue
 
+				if not preview.has_column("n_snps"):
+					break
+
+				candidate = dict(config["post_hoc_filter"], snp_count_min_threshold=snps)
+				threshold_preview.print_threshold_preview(preview, "n_snps", snps, candidate, inclusive=True,
+					description=f"were tested with at least {snps} SNPs")
+				if get_yes_no("\nUse this threshold? (yes/no)\n\n", config):
+					break
+
 			if not no_threshold:
 				config["post_hoc_filter"]["snp_count_min_threshold"]= snps
 
@@ -474,13 +497,10 @@ def main():
 
 			print("For each field in the column, enter the remapped field you'd like to place in the new column...or just press Enter to keep the same value for that field.\n")
 
-			all_fields = set([])
-			with open(coloc_file) as f:
-				head = f.readline()
-				h = head.index(in_column)
-				for line in f:
-					data = line.strip().split()
-					all_fields.add(data[h])
+			all_fields = input_profile.get_distinct_values(profile, in_column)
+			if all_fields is None:
+				yesno = get_yes_no(f"\n\nThe '{in_column}' column has more than {input_profile.max_distinct_values} distinct values, which is too many to remap one at a time here. Do you still want to remap one of the other columns? (yes/no)\n", config)
+				continue
 
 			for field in list(all_fields):
 				out_field = screen_input(f"{field}: ", config)
@@ -667,12 +687,11 @@ def main():
 				config["classify_results"]["rules"][rule_name] = {"type": "specificity", "column": column, "categories": []}
 
 				if column in header:
-					with open(coloc_file) as f:
-						column_vals = set([])
-						f.readline()
-						for line in f:
-							data = line.strip().split()
-							column_vals.add(data[header.index(column)])
+					column_vals = input_profile.get_distinct_values(profile, column)
+					if column_vals is None:
+						print(f"Sorry, the '{column}' column has more than {input_profile.max_distinct_values} distinct values, which is too many to define categories with. Try another column...\n\n")
+						del config["classify_results"]["rules"][rule_name]
+						continue
 				else:
 					# This column is only being created after mutations
 					mutated_column = [mc for mc in config["mutate_columns"]["mutations"] if mc["out"] == column][0]